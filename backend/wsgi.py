@@ -0,0 +1,10 @@
+"""WSGI entry point for running the backend under a production server.
+
+The dev server in app.py is single-threaded and reimports the heavy face
+models on every reload. For real use run multiple preloaded workers so
+recognitions proceed in parallel and the model weights are shared
+copy-on-write:
+
+    gunicorn -w $(nproc) --preload --threads 1 -b 0.0.0.0:5000 wsgi:app
+"""
+from app import app  # noqa: F401